@@ -0,0 +1,190 @@
+"""Low-latency key press backends for the ocarina player.
+
+The backend is picked once, on the first get_backend() call:
+
+- Windows: ``SendInput`` through ctypes with prebuilt ``INPUT`` structs.
+- Linux: an ``evdev.UInput`` virtual keyboard (needs ``pip install evdev`` and
+  write access to ``/dev/uinput``).
+- Anything else, or when the native backend is unavailable: ``pyautogui``.
+
+Every backend exposes ``resolve(key)`` which turns a mapping.json key name into
+a prebuilt ``(press, release)`` pair of callables ahead of time, plus
+``key_down(code)``/``key_up(code)`` which just call them. Characters that need
+Shift get it pressed alongside the key, and any key a native backend cannot
+name goes through pyautogui on its own, so mappings are never rejected just
+because of the backend in use.
+"""
+
+import sys
+from functools import cache, partial
+
+# pyautogui-style names for keys that are not a single printable character.
+_WIN_NAMED_VK = {
+    "backspace": 0x08, "tab": 0x09, "enter": 0x0D, "return": 0x0D,
+    "shift": 0x10, "ctrl": 0x11, "alt": 0x12, "pause": 0x13, "capslock": 0x14,
+    "esc": 0x1B, "escape": 0x1B, "space": 0x20, "pageup": 0x21, "pgup": 0x21,
+    "pagedown": 0x22, "pgdn": 0x22, "end": 0x23, "home": 0x24,
+    "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28,
+    "insert": 0x2D, "delete": 0x2E, "del": 0x2E,
+    **{f"num{n}": 0x60 + n for n in range(10)},
+    **{f"f{n}": 0x6F + n for n in range(1, 25)},
+}
+# VkKeyScanW shift-state bits -> modifier virtual-key codes.
+_WIN_MODIFIERS = ((0x01, 0x10), (0x02, 0x11), (0x04, 0x12))
+_EVDEV_CHAR_NAMES = {
+    " ": "SPACE", "-": "MINUS", "=": "EQUAL", "[": "LEFTBRACE", "]": "RIGHTBRACE",
+    ";": "SEMICOLON", "'": "APOSTROPHE", "`": "GRAVE", "\\": "BACKSLASH",
+    ",": "COMMA", ".": "DOT", "/": "SLASH",
+}
+# Shifted US-layout characters -> the unshifted key that produces them.
+_EVDEV_SHIFTED = dict(zip('~!@#$%^&*()_+{}|:"<>?', "`1234567890-=[]\\;',./"))
+_EVDEV_NAMED = {
+    "return": "ENTER", "escape": "ESC", "ctrl": "LEFTCTRL", "shift": "LEFTSHIFT",
+    "alt": "LEFTALT", "pgup": "PAGEUP", "pgdn": "PAGEDOWN", "del": "DELETE",
+    **{f"num{n}": f"KP{n}" for n in range(10)},
+}
+
+
+@cache
+def _pyautogui_backend():
+    return PyAutoGuiBackend()
+
+
+def _fallback(key: str, backend: str):
+    """Resolve a key the native backend cannot name through pyautogui instead."""
+    try:
+        return _pyautogui_backend().resolve(key)
+    except ImportError:
+        raise ValueError(f"Unsupported key '{key}' for {backend} (install pyautogui to send it)") from None
+
+
+class _Backend:
+    """Codes are (press, release) callables, so pressing costs one call."""
+
+    name = ""
+
+    def key_down(self, code):
+        code[0]()
+
+    def key_up(self, code):
+        code[1]()
+
+
+class SendInputBackend(_Backend):
+    """Windows backend posting prebuilt keyboard INPUT structs via SendInput."""
+
+    name = "sendinput"
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
+                        ("dwExtraInfo", ctypes.c_size_t)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            # Only present so the union (and INPUT) has the size Windows expects.
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG),
+                        ("mouseData", wintypes.DWORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self._ctypes = ctypes
+        self._INPUT = INPUT
+        self._user32 = ctypes.windll.user32
+        self._user32.VkKeyScanW.restype = wintypes.SHORT
+        self._size = ctypes.sizeof(INPUT)
+
+    def _batch(self, strokes):
+        """Prebuild one SendInput call for a list of (vk, key_up) strokes."""
+        batch = (self._INPUT * len(strokes))()
+        for item, (vk, up) in zip(batch, strokes):
+            item.type = 1  # INPUT_KEYBOARD
+            item.u.ki.wVk = vk; item.u.ki.wScan = self._user32.MapVirtualKeyW(vk, 0)
+            if up: item.u.ki.dwFlags = 0x0002  # KEYEVENTF_KEYUP
+        # the partial keeps the array alive for as long as the code is in use
+        return partial(self._user32.SendInput, len(strokes), batch, self._size)
+
+    def resolve(self, key: str):
+        low = key.lower()
+        if low in _WIN_NAMED_VK:
+            vk, shift_state = _WIN_NAMED_VK[low], 0
+        elif len(key) == 1 and (scan := self._user32.VkKeyScanW(ord(key))) != -1:
+            vk, shift_state = scan & 0xFF, (scan >> 8) & 0xFF
+        else:
+            return _fallback(key, self.name)
+        # Like pyautogui, modifiers are only held around the key press itself
+        mods = [mod for bit, mod in _WIN_MODIFIERS if shift_state & bit]
+        press = [(mod, False) for mod in mods] + [(vk, False)] + [(mod, True) for mod in reversed(mods)]
+        return (self._batch(press), self._batch([(vk, True)]))
+
+
+class UInputBackend(_Backend):
+    """Linux backend writing to an evdev virtual keyboard."""
+
+    name = "uinput"
+
+    def __init__(self):
+        from evdev import UInput, ecodes
+        self._ecodes = ecodes
+        self._ui = UInput(name="ocarina-player")
+        self._EV_KEY = ecodes.EV_KEY
+
+    def _emit(self, strokes):
+        for code, value in strokes:
+            self._ui.write(self._EV_KEY, code, value)
+        self._ui.syn()
+
+    def resolve(self, key: str):
+        shifted = len(key) == 1 and (key.isupper() or key in _EVDEV_SHIFTED)
+        if len(key) == 1:
+            base = _EVDEV_SHIFTED.get(key, key.lower())
+            name = _EVDEV_CHAR_NAMES.get(base, base.upper())
+        else:
+            low = key.lower()
+            name = _EVDEV_NAMED.get(low, low.upper())
+        code = self._ecodes.ecodes.get("KEY_" + name)
+        if code is None:
+            return _fallback(key, self.name)
+        press = [(code, 1)]
+        if shifted:
+            shift = self._ecodes.KEY_LEFTSHIFT
+            press = [(shift, 1), (code, 1), (shift, 0)]
+        return (partial(self._emit, press), partial(self._emit, [(code, 0)]))
+
+
+class PyAutoGuiBackend(_Backend):
+    """Portable fallback; slower because every call goes through pyautogui."""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def resolve(self, key: str):
+        return (partial(self._pyautogui.keyDown, key), partial(self._pyautogui.keyUp, key))
+
+
+@cache
+def get_backend():
+    """Return the fastest backend that works here; raises ImportError if none do.
+
+    Imports (evdev, pyautogui) happen here rather than at module import so the
+    player's --help and error paths stay fast.
+    """
+    native = {"win32": SendInputBackend, "linux": UInputBackend}.get(sys.platform)
+    if native is not None:
+        try:
+            return native()
+        except Exception:  # missing evdev, no /dev/uinput access, ...
+            pass
+    return _pyautogui_backend()
+
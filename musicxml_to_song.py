@@ -1,19 +1,43 @@
 #!/usr/bin/env python3
 """Convert MusicXML into Core Keeper ocarina song text."""
 
+from __future__ import annotations
+
 import argparse
+import hashlib
 import json
+import math
+import os
 import re
 import sys
-from collections import Counter, defaultdict
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from fractions import Fraction
+from functools import cache, lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:  # pragma: no cover - only needed for annotations
+    import music21
+
 
-import music21
+# Largest automatic transpose, in semitones, either direction.
+MAX_AUTO_SHIFT = 60
 
+# Boundary rows (two per note) from which the numba sweep beats plain Python
+# once its ~0.5 s import and kernel load are counted; the Python loop costs
+# about 1.5 us per row, so even a 20k-note score sweeps in under 0.1 s.
+JIT_MIN_ROWS = 500_000
+
+# Offsets and durations are integer ticks: TICKS per quarter note.
+TICKS = 64
 
 POW2_DENOMS: List[int] = [1, 2, 4, 8, 16, 32, 64]
+# Length of each POW2_DENOMS note in ticks (whole note = 4 * TICKS).
+_SPEC_UNITS: Tuple[int, ...] = tuple(4 * TICKS // denom for denom in POW2_DENOMS)
+_SPEC_CACHE: Dict[int, str] = {}
 
 SEMITONE_NAMES = [
     "C",
@@ -30,66 +54,69 @@ SEMITONE_NAMES = [
     "B",
 ]
 
-NOTE_REGEX = re.compile(r"^([A-Ga-g])([#b]?)(\d+)$")
+MIDI_NAME_TABLE: Tuple[str, ...] = tuple(
+    f"{SEMITONE_NAMES[midi % 12]}{midi // 12 - 1}" for midi in range(128)
+)
+
+MIDI_SUFFIXES = {".mid", ".midi"}
+
+# MIDI onsets and durations snap to 1/4 or 1/3 quarters, music21's default.
+QUANTIZE_DIVISORS: Tuple[int, ...] = (4, 3)
+
+CACHE_DIR = Path.home() / ".cache" / "ocarina"
+# Bump when the cached arrays change meaning so stale entries are ignored.
+CACHE_VERSION = b"v5"
+
+# Marker used in place of a MIDI number for rests in the flat note list.
+REST = -1
+
+# (midi or REST, start, duration), in ticks.
+ScoreNote = Tuple[int, int, int]
+
+_LETTER_SEMITONES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+_ACCIDENTAL_SHIFT = {"": 0, "#": 1, "b": -1}
+
+
+def _build_name_table() -> Dict[str, int]:
+    """Map every spelling (C#4, Db4, cb4, E#4, ...) of MIDI 0-127 to its number."""
+
+    table: Dict[str, int] = {}
+    for letter, base in _LETTER_SEMITONES.items():
+        for accidental, shift in _ACCIDENTAL_SHIFT.items():
+            for octave in range(-1, 10):
+                midi = 12 * (octave + 1) + base + shift
+                if 0 <= midi <= 127:
+                    for spelled in (letter, letter.lower()):
+                        table[f"{spelled}{accidental}{octave}"] = midi
+    return table
+
+
+_NAME_TO_MIDI: Dict[str, int] = _build_name_table()
 
 
 def note_name_to_midi(name: str) -> int:
     """Convert a note name like C#4 or Db4 to its MIDI number."""
 
-    match = NOTE_REGEX.match(name.strip())
-    if not match:
-        raise ValueError(f"Cannot parse note name '{name}'")
-    letter = match.group(1).upper()
-    accidental = match.group(2)
-    octave = int(match.group(3))
-    key = letter + accidental.upper()
-    if key.endswith("B") and len(key) == 2:
-        enharmonic = {
-            "CB": "B",
-            "DB": "C#",
-            "EB": "D#",
-            "FB": "E",
-            "GB": "F#",
-            "AB": "G#",
-            "BB": "A#",
-        }
-        key = enharmonic.get(key, letter)
-    semitone = {
-        "C": 0,
-        "C#": 1,
-        "D": 2,
-        "D#": 3,
-        "E": 4,
-        "F": 5,
-        "F#": 6,
-        "G": 7,
-        "G#": 8,
-        "A": 9,
-        "A#": 10,
-        "B": 11,
-    }.get(key)
-    if semitone is None:
-        raise ValueError(f"Unsupported note name '{name}'")
-    return 12 * (octave + 1) + semitone
+    try:
+        return _NAME_TO_MIDI[name.strip()]
+    except KeyError:
+        raise ValueError(f"Cannot parse note name '{name}'") from None
 
 
 def midi_to_note_name(midi: int) -> str:
     """Return a canonical sharp-based note name from a MIDI number."""
 
-    octave = (midi // 12) - 1
-    semitone = midi % 12
-    return f"{SEMITONE_NAMES[semitone]}{octave}"
+    return MIDI_NAME_TABLE[midi]
+
 
+def to_ticks(quarter_length: float) -> int:
+    return int(round(quarter_length * TICKS))
 
-def collect_midi_notes(score: music21.stream.Score) -> List[int]:
-    notes: List[int] = []
-    for element in score.flat.notes:
-        if element.isChord:
-            for p in element.pitches:
-                notes.append(int(round(p.midi)))
-        else:
-            notes.append(int(round(element.pitch.midi)))
-    return notes
+
+def collect_midi_notes(notes: Sequence[ScoreNote]) -> np.ndarray:
+    return np.fromiter(
+        (midi for midi, _start, _duration in notes if midi != REST), dtype=np.int16
+    )
 
 
 def load_mapping_midis(path: Optional[Path]) -> List[int]:
@@ -110,45 +137,42 @@ def choose_transpose(
 ) -> int:
     if manual is not None:
         return manual
-    if not piece_midis:
+    if len(piece_midis) == 0:
         return 0
-    if not mapping_midis:
+    if len(mapping_midis) == 0:
         return 0
-    min_piece = min(piece_midis)
-    max_piece = max(piece_midis)
-    min_map = min(mapping_midis)
-    max_map = max(mapping_midis)
-    best_shift: Optional[int] = None
-    best_penalty: Optional[int] = None
-    for shift in range(-60, 61):
-        new_min = min_piece + shift
-        new_max = max_piece + shift
-        under = max(0, min_map - new_min)
-        over = max(0, new_max - max_map)
-        penalty = under + over
-        if best_penalty is None or penalty < best_penalty or (
-            penalty == best_penalty and best_shift is not None and abs(shift) < abs(best_shift)
-        ) or (penalty == best_penalty and best_shift is None):
-            best_penalty = penalty
-            best_shift = shift
-        if penalty == 0 and abs(shift) == 0:
-            break
-    return best_shift or 0
-
-
-def fraction_to_spec(value: Fraction) -> str:
-    """Return a duration specifier like '4+8' for a quarter-length fraction."""
-
-    remaining = value.limit_denominator(64)
+    min_piece, max_piece = int(np.min(piece_midis)), int(np.max(piece_midis))
+    min_map, max_map = int(np.min(mapping_midis)), int(np.max(mapping_midis))
+    # The out-of-range penalty is piecewise linear in the shift and flat
+    # (zero if the piece fits, span difference otherwise) between these two
+    # shifts, so the best shift is the point of that band closest to zero.
+    low, high = sorted((min_map - min_piece, max_map - max_piece))
+    best = min(max(0, low), high)
+    return min(max(best, -MAX_AUTO_SHIFT), MAX_AUTO_SHIFT)
+
+
+def ticks_to_spec(units: int) -> str:
+    """Return a duration specifier like '4+8' for a length in ticks."""
+
+    spec = _SPEC_CACHE.get(units)
+    if spec is not None:
+        return spec
+    remaining = units
     parts: List[str] = []
-    for denom in POW2_DENOMS:
-        part = Fraction(4, denom)
-        while remaining >= part:
+    for denom, bit in zip(POW2_DENOMS, _SPEC_UNITS):
+        while remaining >= bit:
             parts.append(str(denom))
-            remaining -= part
+            remaining -= bit
     if remaining:
-        raise ValueError(f"Cannot represent duration {float(value)} quarter lengths")
-    return "+".join(parts)
+        # Offsets were rounded onto the tick grid at load time, so the source
+        # length (e.g. a 1/3-quarter triplet) is only approximately units / TICKS
+        raise ValueError(
+            f"Cannot represent duration of {units} ticks "
+            f"(~{units / TICKS:g} quarter lengths after rounding to 1/{TICKS}-quarter ticks)"
+        )
+    spec = "+".join(parts)
+    _SPEC_CACHE[units] = spec
+    return spec
 
 
 def fold_into_range(midi: int, bounds: Optional[Tuple[int, int]]) -> Tuple[int, bool]:
@@ -170,67 +194,129 @@ def fold_into_range(midi: int, bounds: Optional[Tuple[int, int]]) -> Tuple[int,
     return adjusted, changed
 
 
+@lru_cache(maxsize=4096)
+def _chord_str(mask: int) -> str:
+    """Join the names of the MIDI numbers set in a 128-bit mask, low to high.
+
+    Pieces repeat the same chords constantly, so results are memoised.
+    """
+
+    names: List[str] = []
+    while mask:
+        lowest = mask & -mask
+        names.append(MIDI_NAME_TABLE[lowest.bit_length() - 1])
+        mask ^= lowest
+    return "+".join(names)
+
+
+def _sweep(
+    spans: np.ndarray, midis: np.ndarray, signs: np.ndarray, span_count: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Walk span-sorted note boundaries and return the sounding set per span.
+
+    ``spans`` holds, for each boundary row, the index of the timepoint it falls
+    on. Returns two uint64 bitmasks per span covering MIDI 0-63 and 64-127.
+    Compiled with numba for very large scores (see JIT_MIN_ROWS).
+    """
+
+    size = spans.shape[0]
+    low_masks = np.empty(span_count, dtype=np.uint64)
+    high_masks = np.empty(span_count, dtype=np.uint64)
+    counts = np.zeros(128, dtype=np.int16)
+    one = np.uint64(1)
+    low = np.uint64(0)
+    high = np.uint64(0)
+    row = 0
+    for span in range(span_count):
+        while row < size and spans[row] == span:
+            midi = midis[row]
+            counts[midi] += signs[row]
+            if midi < 64:
+                bit = one << np.uint64(midi)
+                low = low | bit if counts[midi] > 0 else low & ~bit
+            else:
+                bit = one << np.uint64(midi - 64)
+                high = high | bit if counts[midi] > 0 else high & ~bit
+            row += 1
+        low_masks[span] = low
+        high_masks[span] = high
+    return low_masks, high_masks
+
+
+@cache
+def _sweep_kernel():
+    """Return _sweep, JIT-compiled when numba is installed.
+
+    Importing numba and loading the cached kernel costs around half a second,
+    so extract_events only asks for it above JIT_MIN_ROWS.
+    """
+
+    try:
+        from numba import njit
+    except ImportError:  # numba is optional; the sweep then runs as plain Python
+        return _sweep
+    return njit(cache=True, boundscheck=False)(_sweep)
+
+
 def extract_events(
-    stream: music21.stream.Stream,
+    notes: Sequence[ScoreNote],
     semitone_shift: int,
     fold_bounds: Optional[Tuple[int, int]],
-) -> Tuple[List[str], int]:
-    folded = 0
-    changes: Dict[Fraction, Dict[str, List[int]]] = defaultdict(lambda: {"add": [], "remove": []})
-    timepoints = {Fraction(0)}
+) -> Tuple[Iterator[str], int]:
+    """Return the song lines for the notes (generated lazily) and the folded-note count."""
 
-    def to_fraction(value: float) -> Fraction:
-        return Fraction(value).limit_denominator(64)
+    folded = 0
+    # Parallel columns of note boundaries in ticks: +1 starts a note, -1 ends
+    # it. Rests only contribute timepoints.
+    starts_u: List[int] = []
+    ends_u: List[int] = []
+    rest_times: List[int] = [0]
+    midis: List[int] = []
 
-    for element in stream.flat.notesAndRests:
-        duration = to_fraction(element.duration.quarterLength)
+    for source, start, duration in notes:
         if duration == 0:
             continue
-        start = to_fraction(element.offset)
         end = start + duration
-        timepoints.add(start)
-        timepoints.add(end)
-        if element.isRest:
-            continue
-
-        pitches = element.pitches if element.isChord else [element.pitch]
-        for pitch in pitches:
-            midi = int(round(pitch.midi)) + semitone_shift
-            if not 0 <= midi <= 127:
-                raise ValueError(f"Pitch {pitch} shifted by {semitone_shift} is outside MIDI range")
-            midi, changed = fold_into_range(midi, fold_bounds)
-            if changed:
-                folded += 1
-            changes[start]["add"].append(midi)
-            changes[end]["remove"].append(midi)
-
-    ordered_times = sorted(timepoints)
-    events: List[str] = []
-    active: Counter[int] = Counter()
-
-    for idx, current in enumerate(ordered_times[:-1]):
-        delta = ordered_times[idx + 1] - current
-        if delta <= 0:
+        if source == REST:
+            rest_times += (start, end)
             continue
 
-        # Retire any notes ending at this offset before starting new ones
-        for midi in changes[current]["remove"]:
-            active[midi] -= 1
-            if active[midi] <= 0:
-                del active[midi]
-
-        for midi in changes[current]["add"]:
-            active[midi] += 1
-
-        spec = fraction_to_spec(delta)
-        if not active:
-            events.append(f"R:{spec}")
+        midi = source + semitone_shift
+        if not 0 <= midi <= 127:
+            raise ValueError(
+                f"Pitch {midi_to_note_name(source)} shifted by {semitone_shift} is outside MIDI range"
+            )
+        midi, changed = fold_into_range(midi, fold_bounds)
+        if changed:
+            folded += 1
+        starts_u.append(start)
+        ends_u.append(end)
+        midis.append(midi)
+
+    note_times = np.array(starts_u + ends_u, dtype=np.int64)
+    timepoints = np.unique(np.concatenate([note_times, np.array(rest_times, dtype=np.int64)]))
+    span_arr = np.searchsorted(timepoints, note_times)
+    midi_arr = np.array(midis + midis, dtype=np.int16)
+    sign_arr = np.concatenate([np.ones(len(midis), np.int8), np.full(len(midis), -1, np.int8)])
+    # Order by timepoint, retiring notes that end at an offset before starting new ones
+    order = np.lexsort((sign_arr, span_arr))
+
+    deltas = np.diff(timepoints)
+    sweep = _sweep_kernel() if len(order) >= JIT_MIN_ROWS else _sweep
+    low_masks, high_masks = sweep(span_arr[order], midi_arr[order], sign_arr[order], len(deltas))
+    return _format_events(deltas, low_masks, high_masks), folded
+
+
+def _format_events(
+    deltas: np.ndarray, low_masks: np.ndarray, high_masks: np.ndarray
+) -> Iterator[str]:
+    for delta, low, high in zip(deltas.tolist(), low_masks.tolist(), high_masks.tolist()):
+        spec = ticks_to_spec(delta)
+        mask = low | (high << 64)
+        if not mask:
+            yield f"R:{spec}"
             continue
-
-        names = sorted({midi_to_note_name(midi) for midi in active.keys()})
-        events.append(f"{'+'.join(names)}:{spec}")
-
-    return events, folded
+        yield f"{_chord_str(mask)}:{spec}"
 
 
 def _iter_metronome_marks(stream: music21.stream.Stream) -> Iterable[music21.tempo.MetronomeMark]:
@@ -242,18 +328,18 @@ def _iter_metronome_marks(stream: music21.stream.Stream) -> Iterable[music21.tem
         return []
 
     seen: set[int] = set()
-    found: List[Tuple[Fraction, music21.tempo.MetronomeMark]] = []
+    found: List[Tuple[int, music21.tempo.MetronomeMark]] = []
 
     for start, _end, mark in stream.metronomeMarkBoundaries():
         if mark and id(mark) not in seen:
             seen.add(id(mark))
-            offset = Fraction(start).limit_denominator(64)
+            offset = to_ticks(start)
             found.append((offset, mark))
 
     for mark in stream.recurse().getElementsByClass(tempo.MetronomeMark):
         if id(mark) not in seen:
             seen.add(id(mark))
-            offset = Fraction(getattr(mark, "offset", 0)).limit_denominator(64)
+            offset = to_ticks(getattr(mark, "offset", 0))
             found.append((offset, mark))
 
     for _offset, mark in sorted(found, key=lambda item: item[0]):
@@ -289,12 +375,8 @@ def _quarter_bpm(mark: music21.tempo.MetronomeMark) -> Optional[float]:
     return None
 
 
-def detect_bpm(score: music21.stream.Score) -> Optional[int]:
-    candidates: List[int] = []
-    for mark in _iter_metronome_marks(score):
-        bpm = _quarter_bpm(mark)
-        if bpm and bpm > 0:
-            candidates.append(int(round(bpm)))
+def _pick_bpm(candidates: Sequence[int]) -> Optional[int]:
+    """Pick the score tempo, skipping a leading 120 BPM placeholder."""
 
     if not candidates:
         return None
@@ -307,45 +389,358 @@ def detect_bpm(score: music21.stream.Score) -> Optional[int]:
     return unique[0]
 
 
+def detect_bpm(score: music21.stream.Score) -> Optional[int]:
+    candidates: List[int] = []
+    for mark in _iter_metronome_marks(score):
+        bpm = _quarter_bpm(mark)
+        if bpm and bpm > 0:
+            candidates.append(int(round(bpm)))
+    return _pick_bpm(candidates)
+
+
+def _snap_quarter(
+    quarter_length: float, divisors: Sequence[int] = QUANTIZE_DIVISORS
+) -> Tuple[float, int]:
+    """Snap a performed time to the closest grid of ``divisors`` per quarter.
+
+    Mirrors music21's quantize: halfway values round down, and on equal error
+    the finer grid wins. Returns the snapped value and the divisor it used.
+    """
+
+    best: Optional[Tuple[float, float, float, int]] = None
+    for divisor in divisors:
+        # same float steps as music21.common.nearestMultiple, borderline gaps included
+        unit = 1 / divisor
+        mult = math.floor(quarter_length / unit)
+        low = unit * mult
+        match = low if quarter_length <= low + unit / 2.0 else unit * (mult + 1)
+        candidate = (round(abs(quarter_length - match), 7), 1 / divisor, match, divisor)
+        if best is None or candidate < best:
+            best = candidate
+    assert best is not None
+    return best[2], best[3]
+
+
+def _snap_duration(
+    quarter_length: float, start: float, following: Optional[Tuple[float, int]]
+) -> float:
+    """Snap a note length the way music21's quantize does.
+
+    ``start`` is the note's snapped onset and ``following`` the snapped onset
+    (and divisor) of the next element. A length that would leave a gap shorter
+    than the finest grid step is re-snapped on the next onset's grid, and a
+    note never snaps to zero; it gets the finest step instead:
+
+    >>> _snap_duration(0.1, 0.0, None), _snap_duration(0.125, 0.0, None)
+    (0.25, 0.25)
+    >>> _snap_duration(0.98, 0.0, (1.0, 4)), _snap_duration(0.24, 0.0, (1 / 3, 3))
+    (1.0, 0.3333333333333333)
+    """
+
+    if not quarter_length:
+        return 0.0  # music21 imports zero-length notes as grace notes
+    step = 1 / max(QUANTIZE_DIVISORS)
+    match, _divisor = _snap_quarter(quarter_length)
+    # music21 reads the onset back as a Fraction (opFrac), the next one as a float
+    end = float(Fraction(start).limit_denominator(65535)) + match
+    if following is not None and 0 < following[0] - end < step:
+        match, _divisor = _snap_quarter(quarter_length, (following[1],))
+    return match or step
+
+
+def _midi_chords(track_notes: Iterable, tpq: int) -> List[Tuple[int, int, List[int]]]:
+    """Group a track's notes into (onset, length, pitches) elements, in MIDI ticks.
+
+    Follows music21's MIDI import so quantization sees the same elements:
+    notes starting and ending within a sixteenth of a group's first note join
+    it as one chord, which takes the length of the last note added.
+    """
+
+    timed = sorted(track_notes, key=lambda item: item.time)
+    tolerance = tpq / max(QUANTIZE_DIVISORS)
+    gathered = set()
+    elements: List[Tuple[int, int, List[int]]] = []
+    for index, note in enumerate(timed):
+        if index in gathered:
+            continue
+        pitches = [int(note.pitch)]
+        length = note.duration
+        for other_index in range(index + 1, len(timed)):
+            other = timed[other_index]
+            if abs(other.time - note.time) >= tolerance:
+                break
+            if abs(other.end - note.end) > tolerance:
+                continue  # music21 moves these into another voice instead
+            gathered.add(other_index)
+            pitches.append(int(other.pitch))
+            length = other.duration
+        elements.append((note.time, length, pitches))
+    return elements
+
+
+def _next_barline(end: float, signatures: Sequence[Tuple[float, float]]) -> float:
+    """Round a quarter-length time up to the barline that closes its measure.
+
+    ``signatures`` holds (start, bar length) pairs in quarters, sorted by start;
+    an empty sequence means 4/4 throughout.
+    """
+
+    signatures = list(signatures) or [(0.0, 4.0)]
+    for index, (start, bar) in enumerate(signatures):
+        following = signatures[index + 1][0] if index + 1 < len(signatures) else None
+        if following is None or end <= following:
+            return start + bar * max(0, math.ceil((end - start) / bar - 1e-9))
+    return end  # pragma: no cover - unreachable, the last signature always matches
+
+
+def _load_midi(path: Path) -> Tuple[List[ScoreNote], Optional[int]]:
+    """Read a MIDI file with symusic, quantizing its ticks onto our grid.
+
+    Performed MIDI rarely lands on exact note values, so onsets and durations
+    are snapped the way music21's quantizePost does before the tick rescale.
+    MIDI has no rests, so a rest spanning the whole score stands in for the
+    padding music21 adds to fill the final measure.
+    """
+
+    import symusic
+
+    score = symusic.Score.from_file(str(path))
+    tpq = score.ticks_per_quarter
+    notes: List[ScoreNote] = []
+    for track in score.tracks:
+        if track.is_drum:
+            continue
+        elements = _midi_chords(track.notes, tpq)
+        onsets = [_snap_quarter(on / tpq) for on, _length, _pitches in elements]
+        for index, (_on, length, pitches) in enumerate(elements):
+            start = onsets[index][0]
+            following = onsets[index + 1] if index + 1 < len(onsets) else None
+            duration = to_ticks(_snap_duration(length / tpq, start, following))
+            for pitch in pitches:
+                notes.append((pitch, to_ticks(start), duration))
+    notes.sort(key=lambda item: item[1])
+    if notes:
+        signatures = [
+            (sig.time / tpq, sig.numerator * 4 / sig.denominator)
+            for sig in sorted(score.time_signatures, key=lambda item: item.time)
+        ]
+        last = max(start + duration for _midi, start, duration in notes) / TICKS
+        notes.append((REST, 0, to_ticks(_next_barline(last, signatures))))
+    tempos = sorted(score.tempos, key=lambda item: item.time)
+    # a MIDI file without tempo events plays at 120 BPM, which music21 reports too
+    bpm = _pick_bpm([int(round(t.qpm)) for t in tempos if t.qpm > 0] or [120])
+    return notes, bpm
+
+
+@cache
+def _music21():
+    """Import music21 on first use; the import alone takes about a second.
+
+    Converting MusicXML always needs it. The deferral only pays off for
+    --help, cache hits and MIDI files that symusic reads.
+    """
+
+    import music21
+
+    return music21
+
+
+def _iter_music21_notes(score: music21.stream.Score) -> Iterator[Tuple[float, music21.note.GeneralNote]]:
+    """Yield (score offset, element) for every note, chord and rest.
+
+    Walks parts -> measures -> voices directly and adds up container offsets,
+    which avoids building the flattened stream that ``.flat`` materialises.
+    """
+
+    parts = list(score.parts) or [score]
+    for part in parts:
+        part_offset = part.offset if part is not score else 0.0
+        measures = list(part.getElementsByClass("Measure"))
+        if not measures:
+            for element in part.notesAndRests:
+                yield part_offset + element.offset, element
+            continue
+        for measure in measures:
+            measure_offset = part_offset + measure.offset
+            for element in measure.notesAndRests:
+                yield measure_offset + element.offset, element
+            for voice in measure.voices:
+                voice_offset = measure_offset + voice.offset
+                for element in voice.notesAndRests:
+                    yield voice_offset + element.offset, element
+
+
+def _load_music21(path: Path) -> Tuple[List[ScoreNote], Optional[int]]:
+    score = _music21().converter.parse(str(path))
+    notes: List[ScoreNote] = []
+    for offset, element in _iter_music21_notes(score):
+        start = to_ticks(offset)
+        duration = to_ticks(element.duration.quarterLength)
+        if element.isRest:
+            notes.append((REST, start, duration))
+            continue
+        pitches = element.pitches if element.isChord else [element.pitch]
+        for pitch in pitches:
+            notes.append((int(round(pitch.midi)), start, duration))
+    return notes, detect_bpm(score)
+
+
+def load_score(path: Path) -> Tuple[List[ScoreNote], Optional[int]]:
+    """Return the flat note list and detected BPM for a score file.
+
+    MIDI goes through symusic when it is installed; everything else (or a
+    failed MIDI parse) is read by music21. partitura was measured slower than
+    music21 for MusicXML, mostly because importing it pulls in SciPy and
+    music21 anyway, so MusicXML stays on music21.
+    """
+
+    if path.suffix.lower() in MIDI_SUFFIXES:
+        try:
+            return _load_midi(path)
+        except ImportError:
+            pass
+        except Exception as exc:  # pragma: no cover - depends on the input file
+            print(f"[WARN] 빠른 파서로 읽지 못해 music21로 다시 시도합니다: {exc}", file=sys.stderr)
+    return _load_music21(path)
+
+
+def _cache_path(data: bytes) -> Path:
+    key = hashlib.blake2b(data + b"|" + CACHE_VERSION).hexdigest()[:16]
+    return CACHE_DIR / f"{key}.npz"
+
+
+def load_score_cached(path: Path, use_cache: bool = True) -> Tuple[List[ScoreNote], Optional[int]]:
+    """Like load_score, but keep the parsed notes on disk keyed by file content.
+
+    Only the flat note columns (MIDI, start and duration in ticks) and the
+    BPM are stored, so re-running on the same score skips parsing entirely.
+    """
+
+    if not use_cache:
+        return load_score(path)
+
+    cache_path = _cache_path(path.read_bytes())
+    try:
+        with np.load(cache_path) as cached:
+            pitches, starts, durations = cached["pitches"], cached["starts"], cached["durations"]
+            bpm = int(cached["bpm"])
+    except Exception:  # no entry yet, or an unreadable/stale one
+        notes, bpm = load_score(path)
+        pitches = np.array([midi for midi, _start, _duration in notes], dtype=np.int16)
+        starts = np.array([start for _midi, start, _duration in notes], dtype=np.int64)
+        durations = np.array([duration for _midi, _start, duration in notes], dtype=np.int64)
+        partial: Optional[Path] = None
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # batch workers may write the same key at once, so each gets its own temp file
+            with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".tmp", delete=False) as handle:
+                partial = Path(handle.name)
+                np.savez_compressed(
+                    handle, pitches=pitches, starts=starts, durations=durations, bpm=np.int32(bpm or 0)
+                )
+            partial.replace(cache_path)
+        except OSError:  # pragma: no cover - read-only home, full disk, ...
+            if partial is not None:
+                partial.unlink(missing_ok=True)
+        return notes, bpm
+
+    notes = list(zip(pitches.tolist(), starts.tolist(), durations.tolist()))
+    return notes, bpm or None
+
+
 def convert(
     input_path: Path,
     output_path: Path,
     mapping_path: Optional[Path] = None,
     manual_transpose: Optional[int] = None,
     manual_bpm: Optional[int] = None,
+    use_cache: bool = True,
 ) -> int:
-    score = music21.converter.parse(str(input_path))
-    bpm = manual_bpm if manual_bpm is not None else detect_bpm(score)
-    piece_midis = collect_midi_notes(score)
     mapping_midis = load_mapping_midis(mapping_path)
+    return _convert_with_mapping(
+        input_path, output_path, mapping_midis, manual_transpose, manual_bpm, use_cache
+    )
+
+
+def _convert_with_mapping(
+    input_path: Path,
+    output_path: Path,
+    mapping_midis: Sequence[int],
+    manual_transpose: Optional[int] = None,
+    manual_bpm: Optional[int] = None,
+    use_cache: bool = True,
+) -> int:
+    notes, detected_bpm = load_score_cached(input_path, use_cache)
+    bpm = manual_bpm if manual_bpm is not None else detected_bpm
+    piece_midis = collect_midi_notes(notes)
     semitone_shift = choose_transpose(piece_midis, mapping_midis, manual_transpose)
     fold_bounds: Optional[Tuple[int, int]] = None
     if mapping_midis:
         fold_bounds = (min(mapping_midis), max(mapping_midis))
-    events, folded = extract_events(score, semitone_shift, fold_bounds)
-    lines: List[str] = []
-    if bpm:
-        lines.append(f"BPM={bpm}")
-    lines.extend(events)
-    output_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    events, folded = extract_events(notes, semitone_shift, fold_bounds)
+    # Lines are produced while writing, so stream into a sibling file and only
+    # replace the output once it is complete; a failure leaves any old song intact
+    partial = output_path.with_name(output_path.name + ".tmp")
+    try:
+        with partial.open("w", encoding="utf-8", buffering=1 << 20) as handle:
+            if bpm:
+                handle.write(f"BPM={bpm}\n")
+            for line in events:
+                handle.write(line)
+                handle.write("\n")
+        partial.replace(output_path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
     if manual_bpm is None and bpm is None:
         print(
-            "[WARN] 악보에서 BPM을 찾지 못했습니다. --bpm 옵션으로 직접 지정할 수 있습니다.",
+            f"[WARN] {input_path.name}: 악보에서 BPM을 찾지 못했습니다. --bpm 옵션으로 직접 지정할 수 있습니다.",
             file=sys.stderr,
         )
     if folded and mapping_midis:
         low, high = min(mapping_midis), max(mapping_midis)
         print(
-            f"[INFO] {folded}개의 음이 옥타브 조정되어 매핑 범위({midi_to_note_name(low)}~{midi_to_note_name(high)})에 맞춰졌습니다.",
+            f"[INFO] {input_path.name}: {folded}개의 음이 옥타브 조정되어 매핑 범위({midi_to_note_name(low)}~{midi_to_note_name(high)})에 맞춰졌습니다.",
             file=sys.stderr,
         )
     return semitone_shift
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("input", type=Path, help="MusicXML file to convert")
-    parser.add_argument("output", type=Path, help="Destination song file")
+def _convert_one(job: Tuple[Path, Path, List[int], Optional[int], Optional[int], bool]) -> Optional[int]:
+    """Worker entry point for convert_batch; reports failures instead of raising."""
+
+    input_path = job[0]
+    try:
+        return _convert_with_mapping(*job)
+    except Exception as exc:
+        print(f"[ERROR] {input_path}: {exc}", file=sys.stderr)
+        return None
+
+
+def convert_batch(
+    pairs: Sequence[Tuple[Path, Path]],
+    mapping_path: Optional[Path] = None,
+    manual_transpose: Optional[int] = None,
+    manual_bpm: Optional[int] = None,
+    use_cache: bool = True,
+    workers: Optional[int] = None,
+) -> List[Optional[int]]:
+    """Convert many (input, output) pairs in parallel worker processes.
+
+    The mapping is read once here and shipped to the workers. Returns the
+    applied transpose per pair, or None where that file failed.
+    """
+
+    mapping_midis = load_mapping_midis(mapping_path)
+    jobs = [
+        (input_path, output_path, mapping_midis, manual_transpose, manual_bpm, use_cache)
+        for input_path, output_path in pairs
+    ]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return list(executor.map(_convert_one, jobs, chunksize=4))
+
+
+def _add_common_arguments(parser: argparse.ArgumentParser) -> None:
     default_map = Path(__file__).with_name("mapping.json")
     map_help = "mapping.json 파일 경로 (음역 자동 맞춤)"
     if default_map.exists():
@@ -373,11 +768,82 @@ def main() -> None:
         default=None,
         help="BPM을 직접 지정합니다 (악보의 템포 인식이 잘못될 때 사용)",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"파싱 결과 캐시({CACHE_DIR})를 읽거나 쓰지 않고 항상 악보를 다시 읽습니다",
+    )
+
+
+def _mapping_from_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> Optional[Path]:
     mapping_path = None if args.no_map else args.map
     if mapping_path and not mapping_path.exists():
         parser.error(f"지정한 매핑 파일을 찾을 수 없습니다: {mapping_path}")
-    shift = convert(args.input, args.output, mapping_path, args.transpose, args.bpm)
+    return mapping_path
+
+
+def batch_main(argv: Sequence[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog=f"{Path(sys.argv[0]).name} batch",
+        description="여러 악보 파일을 병렬로 한 번에 변환합니다.",
+    )
+    parser.add_argument("inputs", type=Path, nargs="+", help="변환할 악보 파일들")
+    parser.add_argument(
+        "--out-dir",
+        type=Path,
+        default=None,
+        help="결과(<이름>.txt)를 저장할 폴더 [기본값: 각 입력 파일과 같은 폴더]",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="동시에 실행할 프로세스 수 [기본값: CPU 코어 수]",
+    )
+    _add_common_arguments(parser)
+    args = parser.parse_args(argv)
+    mapping_path = _mapping_from_args(parser, args)
+    pairs = [
+        (path, (args.out_dir or path.parent) / f"{path.stem}.txt") for path in args.inputs
+    ]
+    # a.musicxml and a.mid would both write a.txt; workers must not race on it
+    claimed: Dict[Path, Path] = {}
+    for input_path, output_path in pairs:
+        previous = claimed.setdefault(output_path.resolve(), input_path)
+        if previous is not input_path:
+            parser.error(f"결과 파일이 겹칩니다: {previous}, {input_path} -> {output_path}")
+    if args.out_dir:
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+    shifts = convert_batch(
+        pairs, mapping_path, args.transpose, args.bpm, not args.no_cache, args.workers
+    )
+    failed = 0
+    for (input_path, output_path), shift in zip(pairs, shifts):
+        if shift is None:
+            failed += 1
+            continue
+        print(f"{input_path} -> {output_path} (transpose {shift:+d})")
+    if failed:
+        print(f"{failed}/{len(pairs)}개 파일 변환에 실패했습니다.", file=sys.stderr)
+        sys.exit(1)
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_main(sys.argv[2:])
+        return
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        epilog=f"여러 파일을 한 번에: {Path(sys.argv[0]).name} batch IN1 IN2 ... [--out-dir DIR]",
+    )
+    parser.add_argument("input", type=Path, help="MusicXML file to convert")
+    parser.add_argument("output", type=Path, help="Destination song file")
+    _add_common_arguments(parser)
+    args = parser.parse_args()
+    mapping_path = _mapping_from_args(parser, args)
+    shift = convert(
+        args.input, args.output, mapping_path, args.transpose, args.bpm, not args.no_cache
+    )
     if shift:
         print(f"Applied transpose of {shift:+d} semitones.")
     else:
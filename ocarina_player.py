@@ -14,20 +14,35 @@ New in this version
 Examples are in README.
 """
 import time, re, json, sys
-from typing import List
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
 
-try:
-    import pyautogui
-except ImportError:
-    print("Missing dependency: pyautogui\nInstall with: pip install pyautogui")
-    sys.exit(1)
+from key_backend import get_backend
 
 ENHARMONIC = {"DB":"C#","EB":"D#","GB":"F#","AB":"G#","BB":"A#","E#":"F","B#":"C"}
+NOTE_RE = re.compile(r'^([A-Ga-g])([#b]?)(\d*)$')
+_NOTE_PAT = r'[A-Ga-gR](?:[#b]?\d*)?'
+# One pass over a whole body line; alternatives are tried in this order and
+# anything that is not a clean token falls through to `bad`.
+LINE_RE = re.compile(
+    r'(?P<sep>[\s|,]+)'                                                # token separators
+    r'|(?P<lane>(?i:LOW|HIGH))[^\s|,]*'                                # LOW: / HIGH:
+    r'|(?P<header>(?i:BPM|TEMPO|UNIT|HOLD|STAGGER|REP|MODE|CHORDMODE|CHORD)=[^\s|,]*)'  # inline TEMPO=140
+    r'|(?P<token>'
+    r'(?P<notes>' + _NOTE_PAT + r'(?:\+' + _NOTE_PAT + r')*)'           # C or C+E+G
+    r'(?::(?P<dur>[0-9+]+))?'                                         # :8 or :8+16
+    r'(?P<dots>\.*)'                                                  # . or ..
+    r'(?P<attr>\([^)]*\))?'                                           # (h0.2,st0.01,rep2)
+    r')(?=[\s|,]|$)'
+    r'|(?P<bad>[^\s|,]+)'
+)
+LANE_OCT = {"LOW":4, "HIGH":5}
 
 def norm_note(raw: str, default_oct: int) -> str:
     t = raw.strip()
     if t.upper() == "R": return "R"
-    m = re.match(r'^([A-Ga-g])([#b]?)(\d*)$', t)
+    m = NOTE_RE.match(t)
     if not m: raise ValueError(f"Bad note '{raw}'")
     name = m.group(1).upper(); acc = m.group(2); octv = m.group(3)
     if acc == 'b':
@@ -66,6 +81,7 @@ def parse_duration(spec: str, unit: int, q: float, dots: int) -> float:
     return total
 
 ATTR_RE = re.compile(r'\((?P<body>[^)]*)\)')
+_ATTR_PARSERS = {"h": ("hold", float), "st": ("stagger", float), "rep": ("rep", int)}
 def parse_attrs(attr_str: str) -> dict:
     """
     Attributes: h0.15 (hold seconds), st0.01 (stagger), rep3 (repeat count)
@@ -77,9 +93,18 @@ def parse_attrs(attr_str: str) -> dict:
         c = chunk.strip()
         if not c: continue
         low = c.lower()
-        if low.startswith('h'): out["hold"] = float(c[1:])
-        elif low.startswith('st'): out["stagger"] = float(c[2:])
-        elif low.startswith('rep'): out["rep"] = int(c[3:])
+        # mode words first: "strum"/"seq" would otherwise read as st/rep values
+        if low in ("sim","simul","simultaneous"):
+            out["mode"] = "SIM"
+        elif low in ("strum","arpeggio","seq","sequential"):
+            out["mode"] = "STRUM"
+        elif low.startswith(tuple(_ATTR_PARSERS)):
+            prefix = next(p for p in _ATTR_PARSERS if low.startswith(p))
+            key, conv = _ATTR_PARSERS[prefix]
+            try:
+                out[key] = conv(c[len(prefix):].strip())
+            except ValueError:
+                raise ValueError(f"Bad attribute '{c}'") from None
         elif '=' in c:
             key, val = c.split('=',1)
             key = key.strip().lower(); val = val.strip().upper()
@@ -90,10 +115,6 @@ def parse_attrs(attr_str: str) -> dict:
                     out["mode"] = "STRUM"
                 else:
                     raise ValueError(f"Unknown mode '{val}' in attributes")
-        elif low in ("sim","simul","simultaneous"):
-            out["mode"] = "SIM"
-        elif low in ("strum","arpeggio","seq","sequential"):
-            out["mode"] = "STRUM"
     return out
 
 def strip_inline_comment(line: str) -> str:
@@ -116,32 +137,22 @@ def parse_song(path: str):
     idx = 0
     while idx < len(lines) and parse_header(lines[idx], state): idx+=1
     events = []  # list of dict: {notes:[C4..], dur, hold, stagger, rep}
-    lane_oct = {"LOW":4, "HIGH":5}
-    tok_re = re.compile(
-        r'^(?P<notes>[A-Ga-gR](?:[#b]?\d*)?(?:\+[A-Ga-gR](?:[#b]?\d*)?)*)' # C or C+E+G
-        r'(?::(?P<dur>[0-9+]+))?'                                         # :8 or :8+16
-        r'(?P<dots>\.*)'                                                  # . or ..
-        r'(?P<attr>\([^)]*\))?$'                                          # (h0.2,st0.01,rep2)
-    )
     for line in lines[idx:]:
         if parse_header(line, state): continue
-        # lane switches may be inline tokens; allow multiple per line
-        tokens = line.replace("|"," ").replace(","," ").split()
-        for raw in tokens:
-            up = raw.upper()
-            if up.startswith("LOW"): state["lane"]="LOW"; continue
-            if up.startswith("HIGH"): state["lane"]="HIGH"; continue
-            if up.startswith(("BPM=","TEMPO=","UNIT=","HOLD=","STAGGER=","REP=","MODE=","CHORDMODE=","CHORD=")):
-                parse_header(up, state); continue
-            m = tok_re.match(raw)
-            if not m: raise ValueError(f"Bad token '{raw}'")
+        # lane switches and headers may be inline tokens; allow multiple per line
+        for m in LINE_RE.finditer(line):
+            kind = m.lastgroup
+            if kind == "sep": continue
+            if kind == "lane": state["lane"] = m.group("lane").upper(); continue
+            if kind == "header": parse_header(m.group("header"), state); continue
+            if kind == "bad": raise ValueError(f"Bad token '{m.group()}'")
             notespec = m.group("notes")
             dur_spec = m.group("dur") or ""
             dots = len(m.group("dots") or "")
             attr = parse_attrs(m.group("attr")[1:-1] if m.group("attr") else "")
             dur = parse_duration(dur_spec, state["unit"], state["q"], dots)
             # build chord notes
-            default_oct = lane_oct[state["lane"]]
+            default_oct = LANE_OCT[state["lane"]]
             notes = [norm_note(n, default_oct) for n in notespec.split('+')]
             # merge attributes with state defaults
             ev = {
@@ -155,55 +166,111 @@ def parse_song(path: str):
             events.append(ev)
     return events, state
 
-def chord_play(keys: List[str], hold: float, stagger: float, mode: str):
-    import pyautogui, time
+def wait_until(deadline: float):
+    """Sleep until perf_counter() reaches deadline, spinning the last ~1 ms."""
+    remaining = deadline - time.perf_counter()
+    if remaining > 0.002: time.sleep(remaining - 0.001)
+    while time.perf_counter() < deadline: pass
+
+def chord_play(keys: list, hold: float, stagger: float, mode: str, start: Optional[float] = None):
+    """Press and release keys (codes from get_backend().resolve) on deadlines measured from start (default: now)."""
+    backend = get_backend()
+    key_down = backend.key_down; key_up = backend.key_up
+    if start is None: start = time.perf_counter()
     mode = mode.upper()
+    hold = max(0.01, hold)
     if mode == "SIM":
         for k in keys:
-            pyautogui.keyDown(k)
-        time.sleep(max(0.01, hold))
+            key_down(k)
+        wait_until(start + hold)
         for k in reversed(keys):
-            pyautogui.keyUp(k)
+            key_up(k)
         return
     # default: strum/arpeggiate using stagger
+    gap = stagger if stagger > 0 else 0.0
     for i,k in enumerate(keys):
-        pyautogui.keyDown(k)
-        if stagger>0 and i < len(keys)-1:
-            time.sleep(stagger)
-    time.sleep(max(0.01, hold))
+        wait_until(start + i*gap)
+        key_down(k)
+    release = start + (len(keys)-1)*gap + hold
     for i,k in enumerate(reversed(keys)):
-        pyautogui.keyUp(k)
-        if stagger>0 and i < len(keys)-1:
-            time.sleep(stagger)
+        wait_until(release + i*gap)
+        key_up(k)
+
+@dataclass(slots=True)
+class PlayEvent:
+    """One song event with everything the playback loop needs already resolved."""
+    start: float       # offset from the first event, seconds
+    dur: float
+    keys: tuple        # backend key codes, in chord order
+    rep: int
+    slot: float        # dur split evenly across rep re-triggers
+    used_hold: float   # hold clamped so each re-trigger releases inside its slot
+    stagger: float
+    mode: str
+    is_rest: bool
+
+def finalize_events(events: list, mapping: dict):
+    """
+    Resolve keys and timing for parsed events against a mapping.
+    Events with unmapped notes become rests; one warning lists every missing note.
+    Returns (play_events, total_seconds).
+    """
+    resolve = get_backend().resolve
+    codes = {}  # mapping value -> backend code; building a code (ctypes INPUTs) is not free
+    def code_for(note):
+        key = mapping[note]
+        if key not in codes: codes[key] = resolve(key)
+        return codes[key]
+    out = []
+    missing_all = []
+    offset = 0.0
+    for ev in events:
+        dur = ev["dur"]; rep = max(1, ev["rep"])
+        notes = [n for n in ev["notes"] if n != "R"]
+        missing = [n for n in notes if not mapping.get(n)]
+        for n in missing:
+            if n not in missing_all: missing_all.append(n)
+        slot = dur/rep
+        out.append(PlayEvent(
+            start=offset, dur=dur,
+            keys=() if missing else tuple(code_for(n) for n in notes),
+            rep=rep, slot=slot, used_hold=min(ev["hold"], max(0.01, slot-0.02)),
+            stagger=ev["stagger"], mode=ev["mode"],
+            is_rest=ev["notes"] == ["R"] or bool(missing),
+        ))
+        offset += dur
+    if missing_all:
+        print(f"[WARN] Missing mapping for {missing_all}; those events will rest")
+    return out, offset
+
+@lru_cache(maxsize=4)
+def load_mapping(path: str) -> dict:
+    """Read mapping.json once per path; callers must not mutate the result."""
+    with open(path, "r", encoding="utf-8") as f: return json.load(f)
 
 def play(song_path: str, mapping_path: str, countdown: int = 4):
-    with open(mapping_path, "r", encoding="utf-8") as f: mapping = json.load(f)
+    try:
+        backend = get_backend()
+    except ImportError:
+        print("Missing dependency: pyautogui\nInstall with: pip install pyautogui")
+        sys.exit(1)
+    mapping = load_mapping(mapping_path)
     events, state = parse_song(song_path)
+    plan, total = finalize_events(events, mapping)
     print(f"Loaded song '{song_path}' @ {state['bpm']} BPM, {len(events)} events.")
     print(f"Defaults: UNIT={state['unit']} HOLD={state['hold']} STAGGER={state['stagger']} REP={state['rep']} MODE={state['mode']}")
+    print(f"Key backend: {backend.name}")
     print(f"You have {countdown} seconds to focus the Core Keeper window.")
     for i in range(countdown,0,-1): print(f"... starting in {i}"); time.sleep(1.0)
     print("Playing! (Ctrl+C to abort)")
-    for ev in events:
-        notes = ev["notes"]; dur = ev["dur"]; hold = ev["hold"]; st = ev["stagger"]; rep = max(1, ev["rep"]); mode = ev["mode"]
-        if notes == ["R"]:
-            time.sleep(dur); continue
-        keys = []
-        missing = []
-        for n in notes:
-            if n=="R": continue
-            k = mapping.get(n); 
-            if not k: missing.append(n)
-            else: keys.append(k)
-        if missing:
-            print(f"[WARN] Missing mapping for {missing}; resting {dur:.3f}s"); time.sleep(dur); continue
-        # Repeat logic: split dur into rep slots
-        slot = dur/rep
-        for i in range(rep):
-            used_hold = min(hold, max(0.01, slot-0.02))
-            chord_play(keys, used_hold, st, mode)
-            rest = max(0.0, slot - used_hold)
-            if rest>0: time.sleep(rest)
+    t0 = time.perf_counter()
+    for ev in plan:
+        if ev.is_rest: continue
+        for i in range(ev.rep):
+            press = t0 + ev.start + i*ev.slot
+            wait_until(press)
+            chord_play(ev.keys, ev.used_hold, ev.stagger, ev.mode, press)
+    wait_until(t0 + total)
     print("Done.")
 
 def main():